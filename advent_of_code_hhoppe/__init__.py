@@ -7,32 +7,159 @@ __docformat__ = 'google'
 __version__ = '1.0.7'
 __version_info__ = tuple(int(num) for num in __version__.split('.'))
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
+import concurrent.futures
 import contextlib
 import dataclasses
+import functools
 import gc
+import hashlib
 import io
 import numbers
+import os
 import pathlib
 import re
+import shutil
+import sys
 import tarfile
+import tempfile
 import time
 from typing import Any, Literal
-import unittest.mock
 import urllib.error
-import urllib.request
 
 import aocd  # https://github.com/wimglenn/advent-of-code-data
-import IPython
-import IPython.display
+import urllib3
 
+# Shared connection pool so that repeated fetches from the same host reuse keep-alive connections.
+_HTTP = urllib3.PoolManager(maxsize=16, retries=urllib3.Retry(3))
 
+# Persistent cache of fetched URL contents, enabled by setting the environment variable
+# `AOC_HHOPPE_CACHE=1`.  Puzzle inputs and answers are immutable, so entries never expire.
+CACHE_DIR = pathlib.Path('~/.cache/advent_of_code_hhoppe').expanduser()
+
+_DAY_RE = re.compile(r'day(\d+)')  # Matches a function name like `day5_part1`.
+
+# Line boundaries recognized by `str.splitlines()`, other than '\n' and '\r\n'.
+_OTHER_LINE_BREAK_RE = re.compile('\r(?!\n)|[\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def _http_get(url: str, /, *, preload_content: bool = True) -> urllib3.BaseHTTPResponse:
+  """Returns the response of a GET request on the shared connection pool."""
+  # As with `urllib.request.urlopen`, transport failures raise `urllib.error.URLError`, whereas
+  # error status responses raise its subclass `urllib.error.HTTPError`, which callers suppress.
+  try:
+    response = _HTTP.request('GET', url, preload_content=preload_content)
+  except urllib3.exceptions.HTTPError as e:
+    raise urllib.error.URLError(e) from e
+  if not 200 <= response.status < 300:
+    response.drain_conn()
+    response.release_conn()
+    reason = response.reason or ''
+    raise urllib.error.HTTPError(url, response.status, reason, None, None)  # type: ignore
+  return response
+
+
+@functools.lru_cache(maxsize=128)
 def _read_contents(path_or_url: str, /) -> bytes:
+  """Returns the contents of a local file or URL; results are memoized (see `cache_clear()`)."""
   if path_or_url.startswith(('http://', 'https://')):
-    with urllib.request.urlopen(path_or_url) as response:
-      data: bytes = response.read()
+    use_cache = os.environ.get('AOC_HHOPPE_CACHE') == '1'
+    cache_path = CACHE_DIR / hashlib.blake2b(path_or_url.encode()).hexdigest()
+    if use_cache and cache_path.is_file():
+      return cache_path.read_bytes()
+    response = _http_get(path_or_url)
+    data: bytes = response.data
+    if use_cache:
+      # The cache is only an optimization, so a failure to write it is ignored.
+      tmp_name = None
+      try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # A unique temporary file and atomic rename allow concurrent writers (threads or processes).
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix='.tmp', delete=False) as f:
+          tmp_name = f.name
+          f.write(data)
+        pathlib.Path(tmp_name).replace(cache_path)
+      except OSError:
+        if tmp_name:
+          with contextlib.suppress(OSError):
+            os.unlink(tmp_name)
     return data
-  return pathlib.Path(path_or_url).read_bytes()
+  return _read_local(path_or_url)
+
+
+def _read_local(path: str, /) -> bytes:
+  """Reads a local file in a single unbuffered call, sized from its `fstat`."""
+  with open(path, 'rb', buffering=0) as f:
+    return f.read()
+
+
+@contextlib.contextmanager
+def _silence() -> Iterator[None]:
+  """Discards any output to stdout, stderr, and `IPython.display.display`."""
+  # `IPython` is imported lazily, so there is no display to patch unless it is already loaded.
+  display_module = sys.modules.get('IPython.display')
+  saved_display = getattr(display_module, 'display', None)
+  if display_module:
+    setattr(display_module, 'display', lambda *args, **kwargs: None)
+  try:
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+      yield
+  finally:
+    if display_module:
+      setattr(display_module, 'display', saved_display)
+
+
+@functools.cache
+def _aocd_puzzle(year: int, day: int) -> aocd.models.Puzzle:
+  """Returns a shared `aocd` puzzle, to avoid repeated token and config loading."""
+  return aocd.models.Puzzle(year=year, day=day)
+
+
+@functools.cache
+def _has_aocd_token() -> bool:
+  """Returns True if an `aocd` session token is configured."""
+  return pathlib.Path('~/.config/aocd/token').expanduser().exists()
+
+
+def _extract_tar(path_or_url: str, /, path: pathlib.Path) -> None:
+  """Extracts a `.tar.gz` archive into `path`, streaming it if it is remote.
+
+  Members are first extracted into a temporary directory and moved into place only on success, so
+  that an interrupted download does not leave a partial tree that later calls would accept.
+  """
+  # The 'data' filter (Python 3.9.17+, 3.11.4+) rejects unsafe archive members.
+  kwargs: dict[str, Any] = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+  tmp_dir = pathlib.Path(tempfile.mkdtemp(prefix='.extract_', dir=path))
+  try:
+    if path_or_url.startswith(('http://', 'https://')):
+      # Decompression overlaps network receive, and peak memory is independent of archive size.
+      response = _http_get(path_or_url, preload_content=False)
+      try:
+        stream = io.BufferedReader(response, buffer_size=1 << 20)
+        with tarfile.open(fileobj=stream, mode='r|gz') as tf:
+          tf.extractall(path=tmp_dir, **kwargs)
+      except urllib3.exceptions.HTTPError as e:
+        raise urllib.error.URLError(e) from e
+      finally:
+        response.drain_conn()
+        response.release_conn()
+    else:
+      # Read a local archive directly rather than copying it into memory (and the read cache).
+      with tarfile.open(path_or_url, mode='r:gz') as tf:
+        tf.extractall(path=tmp_dir, **kwargs)
+
+    def move(src: pathlib.Path, dst: pathlib.Path) -> None:
+      # Like `extractall`, merge into any existing directory (e.g., from a concurrent extraction).
+      if src.is_dir() and dst.is_dir():
+        for child in src.iterdir():
+          move(child, dst / child.name)
+      else:
+        src.replace(dst)
+
+    for entry in tmp_dir.iterdir():
+      move(entry, path / entry.name)
+  finally:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
 @dataclasses.dataclass
@@ -52,7 +179,7 @@ class PuzzlePart:
     literal_part: Literal['a', 'b'] = 'a' if self.part == 1 else 'b'
     # Could set: quiet=True.
     aocd.submit(result, year=self.advent.year, day=self.day, part=literal_part, reopen=False)
-    puz = aocd.models.Puzzle(year=self.advent.year, day=self.day)
+    puz = _aocd_puzzle(self.advent.year, self.day)
     if self.part == 1:
       if puz.answered_a:
         answer: str = puz.answer_a
@@ -70,17 +197,14 @@ class PuzzlePart:
     assert self.func
     elapsed_times = []
     for _ in range(repeat):
-      with contextlib.ExitStack() as stack:
-        if silent:
-          for f in ('sys.stdout', 'sys.stderr', 'IPython.display.display'):
-            stack.enter_context(unittest.mock.patch(f))
+      with _silence() if silent else contextlib.nullcontext():
         gc_was_enabled = gc.isenabled()
         try:
           gc.disable()
           gc.collect()
-          start_time = time.monotonic()
+          start_time = time.perf_counter_ns()
           raw_result = self.func(input_)
-          elapsed_times.append(time.monotonic() - start_time)
+          elapsed_times.append(time.perf_counter_ns() - start_time)
         finally:
           if gc_was_enabled:
             gc.enable()
@@ -96,7 +220,7 @@ class PuzzlePart:
           self.answer = self._aocd_submit(result)
         else:
           self.answer = result
-    self.elapsed_time = min(elapsed_times)
+    self.elapsed_time = min(elapsed_times) * 1e-9
     if not silent:
       print(f'(Part {self.part}: {self.elapsed_time:#5.3f} s)', flush=True)
 
@@ -113,11 +237,11 @@ class Puzzle:
   def __post_init__(self) -> None:
     self.advent.puzzles[self.day] = self
     if not self.input and self.advent.input_url:
-      url = self.advent.input_url.format(year=self.advent.year, day=self.day)
+      url = self.advent.get_input_url(self.day)
       with contextlib.suppress(urllib.error.HTTPError, FileNotFoundError):
         self.input = _read_contents(url).decode()
     if not self.input and self.advent.use_aocd:
-      puz = aocd.models.Puzzle(year=self.advent.year, day=self.day)
+      puz = _aocd_puzzle(self.advent.year, self.day)
       self.input = puz.input_data
       if not self.input.endswith('\n'):
         self.input += '\n'
@@ -125,41 +249,67 @@ class Puzzle:
       raise ValueError('The puzzle input cannot be determined.')
     for part in (1, 2):
       puzzle_part = self.parts[part] = PuzzlePart(self.advent, self.day, part)
-      if self.advent.answer_url:
-        url = self.advent.answer_url.format(
-            year=self.advent.year, day=self.day, part=part, part_letter='ab'[part - 1]
-        )
+      url = self.advent.get_answer_url(self.day, part) if self.advent.answer_url else ''
+      if self.advent.use_aocd and url.startswith(('http://', 'https://')):
+        # Before a remote fetch, consult the local `aocd` answer cache.  Locating it may itself
+        # require a network request (to resolve the user id of the token), so any failure falls
+        # through to the answer URL.
+        with contextlib.suppress(aocd.exceptions.AocdError, urllib3.exceptions.HTTPError, OSError):
+          puz = _aocd_puzzle(self.advent.year, self.day)
+          answer_path = puz.answer_a_path if part == 1 else puz.answer_b_path
+          if answer_path.is_file():
+            puzzle_part.answer = answer_path.read_text(encoding='utf-8').strip() or None
+      if puzzle_part.answer is None and url:
         with contextlib.suppress(urllib.error.HTTPError, FileNotFoundError):
           puzzle_part.answer = _read_contents(url).decode()
       if puzzle_part.answer is None and self.advent.use_aocd:
-        puz = aocd.models.Puzzle(year=self.advent.year, day=self.day)
+        puz = _aocd_puzzle(self.advent.year, self.day)
         if part == 1 and puz.answered_a:
           puzzle_part.answer = puz.answer_a
         if part == 2 and puz.answered_b:
           puzzle_part.answer = puz.answer_b
-    if IPython.get_ipython():  # type: ignore
+    # Avoid the cost of importing `IPython` when not running within it.
+    ipython_module = sys.modules.get('IPython')
+    if ipython_module and ipython_module.get_ipython():
       self.print_summary()
 
   def print_summary(self) -> None:
     """Shows the puzzle input (possibly abbreviated) and any stored answers."""
+    import IPython.display
 
     def display_markdown(text: str) -> None:
       IPython.display.display(IPython.display.Markdown(text))  # type: ignore
 
-    lines = [
-        (line[:80] + ' ... ' + line[-35:] if len(line) > 120 else line)
-        for line in self.input.splitlines()
-    ]
+    def abbreviate(line: str) -> str:
+      return line[:80] + ' ... ' + line[-35:] if len(line) > 120 else line
+
+    # Unless the input has line boundaries other than '\n' and '\r\n' (which is rare), count the
+    # lines without splitting the (possibly large) input into a list.
+    all_lines = self.input.splitlines() if _OTHER_LINE_BREAK_RE.search(self.input) else None
+    if all_lines is not None:
+      num_lines = len(all_lines)
+    else:
+      num_lines = self.input.count('\n') + (not self.input.endswith('\n'))
     url = f'https://adventofcode.com/{self.advent.year}/day/{self.day}'
     s = f'For [day {self.day}]({url}), `puzzle.input` has '
-    if len(lines) != 1:
-      s += f'{len(lines):_} lines:'
+    if num_lines != 1:
+      s += f'{num_lines:_} lines:'
     else:
       line = self.input.rstrip('\n')
       s += f'a single line of {len(line):_} characters:'
     display_markdown(s)
-    lines2 = lines[:8] + [' ...'] + lines[-4:] if len(lines) > 13 else lines
-    print('\n'.join(lines2))
+    if all_lines is not None:
+      lines = all_lines[:8] + [' ...'] + all_lines[-4:] if num_lines > 13 else all_lines
+    elif num_lines > 13:
+      head = self.input.split('\n', 8)[:8]
+      tail = self.input.rsplit('\n', 5)
+      if self.input.endswith('\n'):
+        tail.pop()
+      # Like `splitlines()`, omit the '\r' of any CRLF line endings.
+      lines = [line.rstrip('\r') for line in head + [' ...'] + tail[-4:]]
+    else:
+      lines = self.input.splitlines()
+    print('\n'.join(abbreviate(line) for line in lines))
     answers = {part: self.parts[part].answer for part in (1, 2)}
     display_markdown(f'The stored answers are: `{answers}`')
 
@@ -168,7 +318,7 @@ class Puzzle:
     func2: Any = getattr(func, 'func', func)  # For `functools.partial`.
     func_name: str | None = getattr(func2, '__name__', None)
     if func_name:
-      if match := re.match(r'day(\d+)', func_name):
+      if match := _DAY_RE.match(func_name):
         func_day = int(match[1])
         if func_day != self.day:
           raise ValueError(f'Function {func_name} looks incompatible for day {self.day}.')
@@ -199,12 +349,39 @@ class Advent:
       else:
         raise ValueError(f'{self.tar_url=} must have suffix .tar.gz')
       if not (data_dir / data_name).is_dir():
-        with tarfile.open(fileobj=io.BytesIO(_read_contents(self.tar_url)), mode='r:gz') as tf:
-          tf.extractall(path=data_dir)  # Python 3.11.4: use filter='data' for security.
+        _extract_tar(self.tar_url, data_dir)
       self.input_url = f'{data_dir}/{data_name}/{{year}}_{{day:02d}}_input.txt'
       self.answer_url = f'{data_dir}/{data_name}/{{year}}_{{day:02d}}{{part_letter}}_answer.txt'
 
-    self.use_aocd = pathlib.Path('~/.config/aocd/token').expanduser().exists()
+    self.use_aocd = _has_aocd_token()
+
+  def get_input_url(self, day: int) -> str:
+    """Returns the path or URL of the input for a day."""
+    return self.input_url.format(year=self.year, day=day)
+
+  def get_answer_url(self, day: int, part: int) -> str:
+    """Returns the path or URL of the answer for a puzzle part."""
+    return self.answer_url.format(year=self.year, day=day, part=part, part_letter='ab'[part - 1])
+
+  def prefetch(self, days: Iterable[int] = range(1, 26), *, max_workers: int = 16) -> None:
+    """Concurrently fetches the inputs and answers of the given days into the read cache.
+
+    The read cache holds the 128 most recent paths or URLs (i.e., 3 per day), so prefetching more
+    than about 42 days evicts the earliest results.
+    """
+    urls = []
+    for day in days:
+      if self.input_url:
+        urls.append(self.get_input_url(day))
+      if self.answer_url:
+        urls.extend(self.get_answer_url(day, part) for part in (1, 2))
+
+    def fetch(url: str) -> None:
+      with contextlib.suppress(urllib.error.HTTPError, FileNotFoundError):
+        _read_contents(url)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+      list(executor.map(fetch, urls))
 
   def puzzle(self, *args: Any, **kwargs: Any) -> Puzzle:
     """Obtain a daily puzzle."""
@@ -215,6 +392,7 @@ class Advent:
     if recompute and repeat > 1:
       print(f'(Computing min times over {repeat} calls.)')
     total = 0.0
+    lines = []
     for day, puzzle in sorted(self.puzzles.items()):
       s = f'day_{day:<2}'
       for part in (1, 2):
@@ -227,8 +405,9 @@ class Advent:
           puzzle_part.compute(puzzle.input, silent=True, repeat=repeat)
         s += f'{puzzle_part.elapsed_time:#6.3f}'
         total += puzzle_part.elapsed_time
-      print(s)
-    print(f'Total time:{total:#7.3f} s')
+      lines.append(s)
+    lines.append(f'Total time:{total:#7.3f} s')
+    print('\n'.join(lines))
 
 
 # Local Variables:
@@ -2,7 +2,17 @@
 # -*- fill-column: 100; -*-
 """Tests for advent_of_code_hhoppe module."""
 
+import pathlib
+import shutil
+import tarfile
+import types
+from typing import Any
+import urllib.error
+
 import advent_of_code_hhoppe
+import aocd
+import pytest
+import urllib3
 
 BASE_URL = 'https://github.com/hhoppe/advent-of-code-hhoppe/raw/main/testdata'
 INPUT_URL = f'{BASE_URL}/{{year}}_{{day:02d}}_input.txt'
@@ -16,3 +26,173 @@ def test_creation() -> None:
   assert len(puzzle.input) == 2119
   puzzle.verify(1, lambda s: 1044)
   puzzle.verify(2, lambda s: 1054)
+
+
+def test_http_errors(monkeypatch: Any) -> None:
+  """Test that error statuses raise `HTTPError` and transport failures raise only `URLError`."""
+
+  class FakeHttp:
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+      if url.endswith('/missing.txt'):
+        return types.SimpleNamespace(
+            status=404, reason='Not Found', drain_conn=lambda: None, release_conn=lambda: None
+        )
+      raise urllib3.exceptions.ProtocolError('Connection aborted.')
+
+  monkeypatch.setattr(advent_of_code_hhoppe, '_HTTP', FakeHttp())
+  read_contents = advent_of_code_hhoppe._read_contents  # pylint: disable=protected-access
+  read_contents.cache_clear()
+  with pytest.raises(urllib.error.HTTPError) as exc_info:
+    read_contents('https://example.com/missing.txt')
+  assert exc_info.value.code == 404
+  with pytest.raises(urllib.error.URLError) as exc_info2:
+    read_contents('https://example.com/unreachable.txt')
+  assert not isinstance(exc_info2.value, urllib.error.HTTPError)
+  read_contents.cache_clear()
+
+
+def test_disk_cache(monkeypatch: Any, tmp_path: pathlib.Path) -> None:
+  """Test that with `AOC_HHOPPE_CACHE=1`, a repeated URL read is served from the disk cache."""
+  requests = []
+
+  class FakeHttp:
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+      requests.append((method, url))
+      return types.SimpleNamespace(status=200, reason='OK', data=b'contents')
+
+  monkeypatch.setenv('AOC_HHOPPE_CACHE', '1')
+  monkeypatch.setattr(advent_of_code_hhoppe, 'CACHE_DIR', tmp_path / 'cache')
+  monkeypatch.setattr(advent_of_code_hhoppe, '_HTTP', FakeHttp())
+  url = 'https://example.com/2017_01_input.txt'
+  read_contents = advent_of_code_hhoppe._read_contents  # pylint: disable=protected-access
+  read_contents.cache_clear()
+  assert read_contents(url) == b'contents'
+  read_contents.cache_clear()  # Bypass the in-memory cache.
+  assert read_contents(url) == b'contents'
+  read_contents.cache_clear()
+  assert len(requests) == 1
+  assert [path.name.endswith('.tmp') for path in (tmp_path / 'cache').iterdir()] == [False]
+
+  # Failures to write the cache do not affect the result and leave no temporary files.
+  def failing_replace(*args: Any) -> None:
+    raise OSError('Disk full')
+
+  with monkeypatch.context() as m:
+    m.setattr(pathlib.Path, 'replace', failing_replace)
+    assert read_contents(url + '?2') == b'contents'
+  assert len(list((tmp_path / 'cache').iterdir())) == 1
+  (tmp_path / 'file').write_text('')
+  monkeypatch.setattr(advent_of_code_hhoppe, 'CACHE_DIR', tmp_path / 'file' / 'cache')
+  assert read_contents(url + '?3') == b'contents'
+  read_contents.cache_clear()
+  assert len(requests) == 3
+
+
+def test_print_summary(monkeypatch: Any, capsys: Any) -> None:
+  """Test that `print_summary` abbreviates inputs like a full `splitlines()` would."""
+  import IPython.display
+
+  markdowns: list[str] = []
+  monkeypatch.setattr(IPython.display, 'display', lambda obj: markdowns.append(obj.data))
+
+  def expected_lines(input_: str) -> list[str]:
+    lines = [
+        (line[:80] + ' ... ' + line[-35:] if len(line) > 120 else line)
+        for line in input_.splitlines()
+    ]
+    return lines[:8] + [' ...'] + lines[-4:] if len(lines) > 13 else lines
+
+  advent = advent_of_code_hhoppe.Advent(year=2017)
+  advent.use_aocd = False
+  testdata_input = (pathlib.Path(__file__).parent / 'testdata/2017_01_input.txt').read_text()
+  inputs = [testdata_input, 'abc', 'a\nb\n']
+  for num_lines in (13, 14, 20):
+    for newline in ('\n', '\r\n', '\r', '\u2028'):
+      for trailing in (True, False):
+        text = newline.join(f'{i}' * (i * 10 + 1) for i in range(num_lines))
+        inputs.append(text + newline if trailing else text)
+
+  for input_ in inputs:
+    markdowns.clear()
+    puzzle = advent_of_code_hhoppe.Puzzle(advent, 1, input=input_)
+    puzzle.print_summary()
+    assert capsys.readouterr().out.splitlines() == expected_lines(input_)
+    num_lines = len(input_.splitlines())
+    if num_lines == 1:
+      assert f'a single line of {len(input_.rstrip()):_} characters' in markdowns[0]
+    else:
+      assert f'has {num_lines:_} lines' in markdowns[0]
+
+
+def test_prefetch() -> None:
+  """Test that prefetched inputs and answers are reused when creating a puzzle."""
+  testdata = pathlib.Path(__file__).parent / 'testdata'
+  advent = advent_of_code_hhoppe.Advent(
+      year=2017,
+      input_url=f'{testdata}/{{year}}_{{day:02d}}_input.txt',
+      answer_url=f'{testdata}/{{year}}_{{day:02d}}{{part_letter}}_answer.txt',
+  )
+  advent.use_aocd = False
+  read_contents = advent_of_code_hhoppe._read_contents  # pylint: disable=protected-access
+  read_contents.cache_clear()
+  advent.prefetch(days=[1])
+  assert read_contents.cache_info().misses == 3
+  puzzle = advent.puzzle(day=1)
+  assert read_contents.cache_info().hits == 3
+  assert len(puzzle.input) == 2119
+  assert puzzle.parts[1].answer == '1044' and puzzle.parts[2].answer == '1054'
+  read_contents.cache_clear()
+
+
+
+def test_tar_extraction(monkeypatch: Any, tmp_path: pathlib.Path) -> None:
+  """Test extraction of a tar archive, including its merge into an existing directory."""
+  testdata = pathlib.Path(__file__).parent / 'testdata'
+  with tarfile.open(tmp_path / 'pkg.tar.gz', mode='w:gz') as tf:
+    for path in sorted(testdata.iterdir()):
+      tf.add(path, arcname=f'pkg/{path.name}')
+  shutil.copy(tmp_path / 'pkg.tar.gz', tmp_path / 'other.tar.gz')  # Also contains 'pkg/'.
+  monkeypatch.chdir(tmp_path)
+  advent = advent_of_code_hhoppe.Advent(year=2017, tar_url=f'{tmp_path}/pkg.tar.gz')
+  advent_of_code_hhoppe.Advent(year=2017, tar_url=f'{tmp_path}/other.tar.gz')
+  assert [path.name for path in (tmp_path / 'data').iterdir()] == ['pkg']  # No temporary dirs.
+  advent.use_aocd = False
+  puzzle = advent.puzzle(day=1)
+  assert len(puzzle.input) == 2119
+  assert puzzle.parts[1].answer == '1044'
+
+  class FailingHttp:
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+      raise urllib3.exceptions.ProtocolError('Connection aborted.')
+
+  monkeypatch.setattr(advent_of_code_hhoppe, '_HTTP', FailingHttp())
+  with pytest.raises(urllib.error.URLError):
+    advent_of_code_hhoppe.Advent(year=2017, tar_url='https://example.com/remote.tar.gz')
+  assert [path.name for path in (tmp_path / 'data').iterdir()] == ['pkg']
+
+
+def test_answer_url_with_failing_aocd(monkeypatch: Any) -> None:
+  """Test that with an aocd token, a failure to locate the aocd cache falls back to `answer_url`."""
+  testdata = pathlib.Path(__file__).parent / 'testdata'
+
+  class FakeHttp:
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+      data = (testdata / url.rsplit('/', 1)[1]).read_bytes()
+      return types.SimpleNamespace(status=200, reason='OK', data=data)
+
+  def failing_aocd_puzzle(year: int, day: int) -> Any:
+    raise aocd.exceptions.DeadTokenError('Invalid token')
+
+  monkeypatch.setattr(advent_of_code_hhoppe, '_has_aocd_token', lambda: True)
+  monkeypatch.setattr(advent_of_code_hhoppe, '_aocd_puzzle', failing_aocd_puzzle)
+  monkeypatch.setattr(advent_of_code_hhoppe, '_HTTP', FakeHttp())
+  advent_of_code_hhoppe._read_contents.cache_clear()  # pylint: disable=protected-access
+  advent = advent_of_code_hhoppe.Advent(
+      year=2017,
+      input_url=f'{testdata}/{{year}}_{{day:02d}}_input.txt',
+      answer_url='https://example.com/{year}_{day:02d}{part_letter}_answer.txt',
+  )
+  assert advent.use_aocd
+  puzzle = advent.puzzle(day=1)
+  assert puzzle.parts[1].answer == '1044' and puzzle.parts[2].answer == '1054'
+  advent_of_code_hhoppe._read_contents.cache_clear()  # pylint: disable=protected-access